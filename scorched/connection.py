@@ -1,38 +1,266 @@
 from __future__ import unicode_literals
 from scorched.compat import str
 
+import collections
+import concurrent.futures
+import functools
+import gzip
 import itertools
 import json
+import random
 import requests
 import scorched.compat
 import scorched.dates
 import scorched.exc
 import scorched.response
 import scorched.search
+import threading
 import time
 import warnings
 
+try:  # pragma: no cover
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj)
+
+    _HAVE_ORJSON = True
+except ImportError:  # pragma: no cover
+    def _dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+
+    _HAVE_ORJSON = False
+
 
 MAX_LENGTH_GET_URL = 2048
 # Jetty default is 4096; Tomcat default is 8192; picking 2048 to be
 # conservative.
 
+_DEFAULT_SESSION = None
+# Shared by all connections that are not handed an explicit session, so
+# short-lived SolrInterface objects still reuse one keep-alive pool.
+# Reads and writes get separate sessions (bulkheads): a spike of slow
+# update POSTs can then never exhaust the pool used by selects.
+_DEFAULT_WRITE_SESSION = None
+
+_SCHEMA_CACHE = {}
+# Parsed schemas keyed by schema url, stored as (etag, schema).  Web apps
+# that build a SolrInterface per request revalidate with If-None-Match
+# instead of re-downloading and re-parsing the schema every time.
+_SCHEMA_CACHE_LOCK = threading.Lock()
+
+_BREAKERS = {}
+# Circuit breakers keyed by host, shared between connections like the
+# default sessions: a SolrInterface built per web request must see the
+# failures recorded by its predecessors, or the breaker could never trip.
+_BREAKERS_LOCK = threading.Lock()
+
+_UPDATE_BOOL_PARAMS = ('commit', 'softCommit', 'optimize', 'waitSearcher',
+                       'expungeDeletes')
+_UPDATE_INT_PARAMS = (
+    # (name, minimum, conversion error, range error)
+    ('commitWithin', 0, "commitWithin should be a number in milliseconds",
+     "commitWithin should be a number in milliseconds"),
+    ('maxSegments', 1, "maxSegments",
+     "maxSegments should be a positive number"),
+)
+
+
+def _get_default_session():
+    global _DEFAULT_SESSION
+    if _DEFAULT_SESSION is None:
+        _DEFAULT_SESSION = requests.Session()
+    return _DEFAULT_SESSION
+
+
+def _get_default_write_session():
+    global _DEFAULT_WRITE_SESSION
+    if _DEFAULT_WRITE_SESSION is None:
+        _DEFAULT_WRITE_SESSION = requests.Session()
+    return _DEFAULT_WRITE_SESSION
+
+
+def _get_breaker(host, trip_threshold, reset_timeout):
+    # like the adapter mounting, the first connection to a host wins the
+    # breaker tuning
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(host)
+        if breaker is None:
+            breaker = _CircuitBreaker(trip_threshold, reset_timeout)
+            _BREAKERS[host] = breaker
+        return breaker
+
 
 def is_iter(val):
     return isinstance(val, (tuple, list))
 
 
+def _delete_ids_message(ids):
+    """
+    Encode a delete-by-ids message, writing the JSON by hand for the
+    common homogeneous id lists.  The stdlib encoder pays an isinstance
+    dispatch per element; a plain join doesn't.  Ids that would need
+    escaping (or mixed-type lists) fall back to the generic encoder, as
+    does an orjson install, which is faster than the join anyway.
+    """
+    if is_iter(ids) and ids and not _HAVE_ORJSON:
+        if all(type(i) is str and '"' not in i and '\\' not in i and
+               i.isprintable() for i in ids):
+            return ('{"delete": ["' + '", "'.join(ids) +
+                    '"]}').encode('utf-8')
+        if all(type(i) is int for i in ids):
+            return ('{"delete": [' + ', '.join(map(str, ids)) +
+                    ']}').encode('utf-8')
+    return _dumps({"delete": ids})
+
+
+@functools.lru_cache(maxsize=4096)
+def _solr_date_str(value):
+    # Bulk loads often share timestamps between documents (e.g. one
+    # ingestion time for a whole feed); caching amortizes the datetime
+    # formatting across the duplicates.
+    return str(scorched.dates.solr_date(value))
+
+
+def _prepare_url(base, params):
+    """
+    Encode ``params`` onto ``base`` the way requests would.
+
+    A bare PreparedRequest only runs the url/params encoding, skipping
+    the method, header, cookie, body and hook preparation that a full
+    ``requests.Request(...).prepare()`` does per call.
+    """
+    prepared = requests.models.PreparedRequest()
+    prepared.prepare_url(base, params)
+    return prepared.url
+
+
+class _HttpxSession(object):
+    """
+    Adapter exposing the ``requests.Session.request`` interface on top of
+    an HTTP/2-enabled ``httpx.Client``.
+
+    HTTP/2 multiplexes concurrent queries over a single connection (one
+    TLS handshake, compressed headers) instead of opening a pool of
+    sockets.  httpx is an optional dependency; transport errors are
+    translated to their requests equivalents so the retry and circuit
+    breaker logic works unchanged.
+    """
+
+    def __init__(self):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError(
+                "http2=True requires the 'httpx' package "
+                "(pip install 'httpx[http2]')")
+        self._httpx = httpx
+        self._client = httpx.Client(http2=True)
+
+    def request(self, method, url, **kwargs):
+        httpx = self._httpx
+        if kwargs.pop('stream', False):
+            # httpx streams via client.send()/iter_bytes() and its
+            # responses have no requests-compatible ``raw`` attribute
+            raise NotImplementedError(
+                "streaming responses are not supported with http2=True")
+        timeout = kwargs.pop('timeout', None)
+        if isinstance(timeout, tuple):
+            if timeout:
+                connect, read = timeout
+                timeout = httpx.Timeout(read, connect=connect)
+            else:
+                timeout = None
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        if 'data' in kwargs:
+            body = kwargs.pop('data')
+            if isinstance(body, dict):
+                kwargs['data'] = body
+            else:
+                kwargs['content'] = body
+        try:
+            return self._client.request(method, url, **kwargs)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(e)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e)
+
+
+class _CircuitBreaker(object):
+    """
+    Minimal circuit breaker guarding a single Solr host.  Instances are
+    shared between all connections to the same host via ``_get_breaker``.
+
+    After ``trip_threshold`` consecutive failures the breaker opens and
+    callers fail fast instead of piling up on network timeouts.  After
+    ``reset_timeout`` seconds a single probe request is let through
+    (half-open); its outcome decides whether the breaker closes again.
+    """
+    closed, open, half_open = 'closed', 'open', 'half_open'
+
+    def __init__(self, trip_threshold=5, reset_timeout=30.0):
+        self.trip_threshold = trip_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.closed
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.closed:
+                return True
+            if self.state == self.open:
+                if time.time() - self.opened_at >= self.reset_timeout:
+                    self.state = self.half_open
+                    return True
+                return False
+            # half-open: a probe is already in flight
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.closed
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if (self.state == self.half_open or
+                    self.failures >= self.trip_threshold):
+                self.state = self.open
+                self.opened_at = time.time()
+
+
 class SolrConnection(object):
     readable = True
     writeable = True
+    # shared header dicts -- requests copies them into its own structures,
+    # so hoisting them here saves an allocation per call
+    _JSON_HEADERS = {"Content-Type": "application/json; charset=utf-8"}
+    _JSON_GZIP_HEADERS = {"Content-Type": "application/json; charset=utf-8",
+                          "Content-Encoding": "gzip"}
+    _FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+    _TEXT_HEADERS = {"Content-Type": "text/plain; charset=utf-8"}
 
     def __init__(self, url, http_connection, mode, retry_timeout,
-                 max_length_get_url, search_timeout=()):
+                 max_length_get_url, search_timeout=(), pool_maxsize=64,
+                 write_pool_maxsize=None,
+                 max_retries=None, base_delay=0.5, max_delay=30.0,
+                 jitter=0.5, trip_threshold=5, reset_timeout=30.0,
+                 connect_timeout=3.05, read_timeout=30, http2=False):
         """
         :param url: url to Solr
         :type url: str
         :param http_connection: existing requests.Session object, or None to
-                                create a new one.
+                                use a session shared between all connections.
+                                The session keeps the underlying TCP
+                                connections to Solr alive between requests;
+                                long-running applications may pass their own
+                                session with a mounted
+                                ``requests.adapters.HTTPAdapter`` to tune the
+                                pool size.
         :type http_connection: requests connection
         :param mode: mode (readable, writable) Solr
         :type mode: str
@@ -44,20 +272,149 @@ class SolrConnection(object):
                                send data before giving up, as a float, or a
                                (connect timeout, read timeout) tuple.
         :type search_timeout: float or tuple
+        :param pool_maxsize: (optional) maximum number of kept-alive
+                             connections to the Solr host; size it to the
+                             expected concurrency.  Only used for sessions
+                             created by scorched itself -- an externally
+                             supplied ``http_connection`` is left untouched.
+                             Reads (select/mlt/schema) and writes (update)
+                             use separate sessions with independent pools,
+                             so indexing backpressure cannot starve
+                             queries.
+        :type pool_maxsize: int
+        :param write_pool_maxsize: (optional) pool size for the write
+                                   session; defaults to ``pool_maxsize``
+        :type write_pool_maxsize: int
+        :param max_retries: (optional) number of retries after a connection
+                            error or timeout, with exponential backoff.
+                            Defaults to the legacy behaviour derived from
+                            ``retry_timeout``: no retry if it is negative,
+                            otherwise a single retry after sleeping
+                            ``retry_timeout`` seconds.
+        :type max_retries: int
+        :param base_delay: (optional) backoff delay before the first retry,
+                           doubled on every further attempt
+        :type base_delay: float
+        :param max_delay: (optional) upper bound on the backoff delay
+        :type max_delay: float
+        :param jitter: (optional) randomize each delay by up to this
+                       fraction, so synchronized clients don't stampede a
+                       recovering Solr
+        :type jitter: float
+        :param trip_threshold: (optional) consecutive failures after which
+                               the circuit breaker opens and requests raise
+                               :class:`scorched.exc.SolrCircuitOpen` without
+                               touching the network.  Breakers are shared
+                               between all connections to the same host;
+                               the first connection fixes the tuning.
+        :type trip_threshold: int
+        :param reset_timeout: (optional) seconds the breaker stays open
+                              before letting a probe request through
+        :type reset_timeout: float
+        :param connect_timeout: (optional) seconds to wait for the TCP
+                                connection to Solr before giving up
+        :type connect_timeout: float
+        :param read_timeout: (optional) seconds to wait for Solr to send
+                             data before giving up; tune to slightly above
+                             your p95 request time.  Pass None for either
+                             timeout to wait forever.
+        :type read_timeout: float
+        :param http2: (optional) talk to Solr over HTTP/2 via the optional
+                      httpx package, multiplexing concurrent requests over
+                      a single connection instead of a socket pool
+        :type http2: bool
         """
-        self.http_connection = http_connection or requests.Session()
+        if http_connection is not None:
+            # the caller owns the session (and its pooling); no bulkhead
+            self._read_session = http_connection
+            self._write_session = http_connection
+        elif http2:
+            # one multiplexed connection serves reads and writes
+            self._read_session = self._write_session = _HttpxSession()
+        else:
+            self._read_session = _get_default_session()
+            self._write_session = _get_default_write_session()
+        # kept as an alias for backwards compatibility
+        self.http_connection = self._read_session
         if mode == 'r':
             self.writeable = False
         elif mode == 'w':
             self.readable = False
         self.url = url.rstrip("/") + "/"
         self.update_url = self.url + "update/json"
+        self._update_url_q = self.update_url + "?"
         self.select_url = self.url + "select/"
         self.mlt_url = self.url + "mlt/"
         self.get_url = self.url + "get/"
         self.retry_timeout = retry_timeout
+        if max_retries is not None:
+            self.max_retries = max_retries
+        else:
+            self.max_retries = 0 if retry_timeout < 0 else 1
+        self._fixed_retry_delay = (
+            retry_timeout if max_retries is None and retry_timeout >= 0
+            else None)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        parsed = scorched.compat.urlparse(self.url)
+        self._host = "%s://%s" % (parsed.scheme, parsed.netloc)
+        self._breaker = _get_breaker(self._host, trip_threshold,
+                                     reset_timeout)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
         self.max_length_get_url = max_length_get_url
         self.search_timeout = search_timeout
+        self.pool_maxsize = pool_maxsize
+        self.write_pool_maxsize = (
+            write_pool_maxsize if write_pool_maxsize is not None
+            else pool_maxsize)
+        if http_connection is None and not http2:
+            # The default adapter caps pool_maxsize at 10; under concurrent
+            # calls extra connections get created and thrown away, losing
+            # the keep-alive benefit.  Only mount once per host: the
+            # sessions are shared between connections, and remounting
+            # would discard the warm pool of every earlier connection to
+            # the same Solr.
+            host = self._host
+            for session, maxsize in (
+                    (self._read_session, self.pool_maxsize),
+                    (self._write_session, self.write_pool_maxsize)):
+                if host not in session.adapters:
+                    session.mount(host, requests.adapters.HTTPAdapter(
+                        pool_connections=4, pool_maxsize=maxsize,
+                        max_retries=0))
+
+    def _retry_delay(self, attempt):
+        if self._fixed_retry_delay is not None:
+            return self._fixed_retry_delay
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay * (1 + random.uniform(0, self.jitter))
+
+    def _should_retry(self, method, exc):
+        # GETs are idempotent and always safe to retry.  POSTs (mostly
+        # /update) are only retried when the request never reached the
+        # server, which is what a ConnectionError signals; a Timeout may
+        # mean Solr accepted the request and is still chewing on it.
+        if method.upper() == 'GET':
+            return True
+        return isinstance(exc, requests.exceptions.ConnectionError)
+
+    def _prepare_read(self, base, params):
+        """
+        Build a GET request for the read session, prepared exactly once.
+
+        Returns ``(prepared, url)``; ``prepared`` is None for backends
+        without ``prepare_request``/``send`` (the httpx adapter), in
+        which case only the encoded url can be used.  Preparing through
+        the session merges its settings (auth, default headers) like
+        ``Session.request`` would.
+        """
+        if hasattr(self._read_session, 'prepare_request'):
+            prepared = self._read_session.prepare_request(
+                requests.Request('GET', base, params=params))
+            return prepared, prepared.url
+        return None, _prepare_url(base, params)
 
     def request(self, *args, **kwargs):
         """
@@ -66,17 +423,68 @@ class SolrConnection(object):
         :param kwargs: key word arguments
         :type kwargs: dict
 
+        Connection errors and timeouts are retried up to ``max_retries``
+        times with capped exponential backoff and jitter.  When the
+        circuit breaker is open, :class:`scorched.exc.SolrCircuitOpen` is
+        raised immediately so callers can fall back.
+
+        Requests go through the read session unless ``session`` is passed;
+        ``update`` routes through the separate write session.  A
+        ``prepared`` requests.PreparedRequest is sent as-is via
+        ``Session.send``, skipping a second url preparation.
+
         .. todo::
             Make this api more explicit!
         """
-        try:
-            return self.http_connection.request(*args, **kwargs)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.Timeout):
-            if self.retry_timeout < 0:
+        session = kwargs.pop('session', None)
+        if session is None:
+            session = self._read_session
+        prepared = kwargs.pop('prepared', None)
+        if not self._breaker.allow():
+            raise scorched.exc.SolrCircuitOpen(
+                "Circuit breaker open for %s" % self.url)
+        # Without a timeout a half-dead Solr hangs the worker forever,
+        # defeating both the retry and the circuit-breaker logic.
+        kwargs.setdefault('timeout', (self.connect_timeout,
+                                      self.read_timeout))
+        if prepared is not None:
+            method = prepared.method
+            data = prepared.body
+        else:
+            method = args[0] if args else kwargs.get('method', 'GET')
+            data = kwargs.get('data')
+        # A streamed (generator) body is consumed by the first send
+        # attempt; replaying it would POST an empty or truncated message.
+        rewindable_body = data is None or isinstance(data, (str, bytes,
+                                                            dict))
+        for attempt in range(self.max_retries + 1):
+            try:
+                if prepared is not None:
+                    response = session.send(prepared, **kwargs)
+                else:
+                    response = session.request(*args, **kwargs)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as e:
+                self._breaker.record_failure()
+                if (attempt >= self.max_retries or
+                        not rewindable_body or
+                        not self._should_retry(method, e)):
+                    raise
+                time.sleep(self._retry_delay(attempt))
+            except Exception:
+                # Truncated or garbled responses (ChunkedEncodingError,
+                # ContentDecodingError, ...) are failures too.  They must
+                # be recorded: if one escaped a half-open probe without a
+                # verdict, the breaker would be stuck half-open and every
+                # later call would raise SolrCircuitOpen.
+                self._breaker.record_failure()
                 raise
-            time.sleep(self.retry_timeout)
-            return self.http_connection.request(*args, **kwargs)
+            else:
+                if response.status_code >= 500:
+                    self._breaker.record_failure()
+                else:
+                    self._breaker.record_success()
+                return response
 
     def get(self, ids, fl=None):
         """
@@ -97,18 +505,24 @@ class SolrConnection(object):
         if fl:
             params.append(("fl", ",".join(fl)))
 
-        qs = scorched.compat.urlencode(params)
-        url = "%s?%s" % (self.get_url, qs)
-
-        response = self.request("GET", url)
+        prepared, url = self._prepare_read(self.get_url, params)
+        if prepared is not None:
+            response = self.request(prepared=prepared)
+        else:
+            response = self.request("GET", url)
         if response.status_code != 200:
             raise scorched.exc.SolrError(response)
         return response.text
 
-    def update(self, update_doc, **kwargs):
+    def update(self, update_doc, compressed=False, **kwargs):
         """
-        :param update_doc: data send to Solr
+        :param update_doc: data send to Solr; a json string, bytes, or an
+                           iterable of bytes which is streamed to Solr
+                           using chunked transfer-encoding
         :type update_doc: json data
+        :param compressed: optional -- the body is gzip-compressed and
+                           should be sent with ``Content-Encoding: gzip``
+        :type compressed: bool
         :returns: json -- json string
 
         Send json to Solr
@@ -117,11 +531,13 @@ class SolrConnection(object):
             raise TypeError("This Solr instance is only for reading")
         body = update_doc
         if body:
-            headers = {"Content-Type": "application/json; charset=utf-8"}
+            headers = (self._JSON_GZIP_HEADERS if compressed
+                       else self._JSON_HEADERS)
         else:
             headers = {}
         url = self.url_for_update(**kwargs)
-        response = self.request('POST', url, data=body, headers=headers)
+        response = self.request('POST', url, data=body, headers=headers,
+                                session=self._write_session)
         if response.status_code != 200:
             raise scorched.exc.SolrError(response)
         return response.text
@@ -154,86 +570,96 @@ class SolrConnection(object):
         This functions sets all extra parameters for the ``optimize`` and
         ``commit`` function.
         """
+        opts = {'commit': commit, 'commitWithin': commitWithin,
+                'softCommit': softCommit, 'optimize': optimize,
+                'waitSearcher': waitSearcher,
+                'expungeDeletes': expungeDeletes,
+                'maxSegments': maxSegments}
         extra_params = {}
-        if commit is not None:
-            extra_params['commit'] = "true" if commit else "false"
-        if commitWithin is not None:
-            try:
-                extra_params['commitWithin'] = int(commitWithin)
-            except (TypeError, ValueError):
-                raise ValueError(
-                    "commitWithin should be a number in milliseconds")
-            if extra_params['commitWithin'] < 0:
-                raise ValueError(
-                    "commitWithin should be a number in milliseconds")
-            extra_params['commitWithin'] = str(extra_params['commitWithin'])
-        if softCommit is not None:
-            extra_params['softCommit'] = "true" if softCommit else "false"
-        if optimize is not None:
-            extra_params['optimize'] = "true" if optimize else "false"
-        if waitSearcher is not None:
-            extra_params['waitSearcher'] = "true" if waitSearcher else "false"
-        if expungeDeletes is not None:
-            extra_params[
-                'expungeDeletes'] = "true" if expungeDeletes else "false"
-        if maxSegments is not None:
+        for name in _UPDATE_BOOL_PARAMS:
+            value = opts[name]
+            if value is not None:
+                extra_params[name] = "true" if value else "false"
+        for name, minimum, convert_error, range_error in _UPDATE_INT_PARAMS:
+            value = opts[name]
+            if value is None:
+                continue
             try:
-                extra_params['maxSegments'] = int(maxSegments)
+                value = int(value)
             except (TypeError, ValueError):
-                raise ValueError("maxSegments")
-            if extra_params['maxSegments'] <= 0:
-                raise ValueError("maxSegments should be a positive number")
-            extra_params['maxSegments'] = str(extra_params['maxSegments'])
+                raise ValueError(convert_error)
+            if value < minimum:
+                raise ValueError(range_error)
+            extra_params[name] = str(value)
         if 'expungeDeletes' in extra_params and 'commit' not in extra_params:
             raise ValueError("Can't do expungeDeletes without commit")
         if 'maxSegments' in extra_params and 'optimize' not in extra_params:
             raise ValueError("Can't do maxSegments without optimize")
         if extra_params:
-            return "%s?%s" % (self.update_url, scorched.compat.urlencode(
-                sorted(extra_params.items())))
+            return self._update_url_q + scorched.compat.urlencode(
+                sorted(extra_params.items()))
         else:
             return self.update_url
 
-    def select(self, params):
+    def select(self, params, stream=False):
         """
         :param params: LuceneQuery converted to a dictionary with search
                        queries
         :type params: dict
-        :returns: json -- json string
+        :param stream: optional -- don't buffer the response body; return
+                       the requests response object so the caller can
+                       parse it incrementally.  The caller must close it.
+        :type stream: bool
+        :returns: json -- json string, or the response when ``stream``
 
         We perform here a search on the `select` handler of Solr.
         """
         if not self.readable:
             raise TypeError("This Solr instance is only for writing")
         params.append(('wt', 'json'))
-        qs = scorched.compat.urlencode(params)
-        url = "%s?%s" % (self.select_url, qs)
+        # prepare the request once; its url doubles as the length
+        # measurement for the GET/POST switch
+        prepared, url = self._prepare_read(self.select_url, params)
         if len(url) > self.max_length_get_url:
             warnings.warn(
                 "Long query URL encountered - POSTing instead of "
                 "GETting. This query will not be cached at the HTTP layer")
+            qs = url.split('?', 1)[1]
+            prepared = None
             url = self.select_url
             method = 'POST'
-            kwargs = {
-                'data': qs,
-                'headers': {
-                    "Content-Type": "application/x-www-form-urlencoded"}}
+            kwargs = {'data': qs, 'headers': self._FORM_HEADERS}
         else:
             method = 'GET'
             kwargs = {}
         if self.search_timeout != ():
             kwargs['timeout'] = self.search_timeout
-        response = self.request(method, url, **kwargs)
+        if stream:
+            kwargs['stream'] = True
+        if prepared is not None:
+            response = self.request(prepared=prepared, **kwargs)
+        else:
+            response = self.request(method, url, **kwargs)
         if response.status_code != 200:
+            if stream:
+                # nothing consumed the body; close it so the pooled
+                # connection is not leaked
+                response.close()
             raise scorched.exc.SolrError(response)
+        if stream:
+            return response
         return response.text
 
-    def mlt(self, params, content=None):
+    def mlt(self, params, content=None, stream=False):
         """
         :param params: LuceneQuery converted to a dictionary with search
                        queries
         :type params: dict
-        :returns: json -- json string
+        :param stream: optional -- don't buffer the response body; return
+                       the requests response object so the caller can
+                       parse it incrementally.  The caller must close it.
+        :type stream: bool
+        :returns: json -- json string, or the response when ``stream``
 
         Perform a MoreLikeThis query using the content specified
         There may be no content if stream.url is specified in the params.
@@ -241,26 +667,33 @@ class SolrConnection(object):
         if not self.readable:
             raise TypeError("This Solr instance is only for writing")
         params.append(('wt', 'json'))
-        qs = scorched.compat.urlencode(params)
-        base_url = "%s?%s" % (self.mlt_url, qs)
         method = 'GET'
         kwargs = {}
         if content is None:
-            url = base_url
+            prepared, url = self._prepare_read(self.mlt_url, params)
         else:
-            get_url = "%s&stream.body=%s" % (
-                base_url, scorched.compat.quote_plus(content))
-            if len(get_url) <= self.max_length_get_url:
-                url = get_url
-            else:
-                url = base_url
+            prepared, url = self._prepare_read(
+                self.mlt_url, params + [('stream.body', content)])
+            if len(url) > self.max_length_get_url:
+                prepared = None
+                url = _prepare_url(self.mlt_url, params)
                 method = 'POST'
-                kwargs = {
-                    'data': content,
-                    'headers': {"Content-Type": "text/plain; charset=utf-8"}}
-        response = self.request(method, url, **kwargs)
+                kwargs = {'data': content, 'headers': self._TEXT_HEADERS}
+        if stream:
+            kwargs['stream'] = True
+        if prepared is not None:
+            response = self.request(prepared=prepared, **kwargs)
+        else:
+            response = self.request(method, url, **kwargs)
         if response.status_code != 200:
-            raise scorched.exc.SolrError(response.content)
+            # reading .content drains a streamed body; close it as well
+            # so the pooled connection is not leaked
+            error = scorched.exc.SolrError(response.content)
+            if stream:
+                response.close()
+            raise error
+        if stream:
+            return response
         return response.text
 
 
@@ -269,11 +702,15 @@ class SolrInterface(object):
 
     def __init__(self, url, http_connection=None, mode='',
                  retry_timeout=-1, max_length_get_url=MAX_LENGTH_GET_URL,
-                 search_timeout=()):
+                 search_timeout=(), pool_maxsize=64, http2=False):
         """
         :param url: url to Solr
         :type url: str
-        :param http_connection: optional -- already existing connection
+        :param http_connection: optional -- already existing connection, e.g.
+                                a requests.Session with a tuned HTTPAdapter.
+                                By default a session shared between all
+                                interfaces is used, so connections to Solr
+                                are kept alive across instances.
         :type http_connection: requests connection
         :param mode: optional -- mode (readable, writable) Solr
         :type mode: str
@@ -285,23 +722,43 @@ class SolrInterface(object):
                                send data before giving up, as a float, or a
                                (connect timeout, read timeout) tuple.
         :type search_timeout: float or tuple
+        :param pool_maxsize: optional -- maximum number of kept-alive
+                             connections to the Solr host
+        :type pool_maxsize: int
+        :param http2: optional -- talk to Solr over HTTP/2 (requires the
+                      optional httpx package)
+        :type http2: bool
         """
 
         self.conn = SolrConnection(
-            url, http_connection, mode, retry_timeout, max_length_get_url)
+            url, http_connection, mode, retry_timeout, max_length_get_url,
+            pool_maxsize=pool_maxsize, http2=http2)
         self.schema = self.init_schema()
         self._datefields = self._extract_datefields(self.schema)
+        self._compile_datefields()
 
     def init_schema(self):
-        response = self.conn.request(
-            'GET', scorched.compat.urljoin(self.conn.url,
-                                           self.remote_schema_file))
+        schema_url = scorched.compat.urljoin(self.conn.url,
+                                             self.remote_schema_file)
+        with _SCHEMA_CACHE_LOCK:
+            cached = _SCHEMA_CACHE.get(schema_url)
+        headers = {}
+        if cached is not None:
+            headers['If-None-Match'] = cached[0]
+        response = self.conn.request('GET', schema_url, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            return cached[1]
         if response.status_code != 200:
             raise EnvironmentError(
                 "Couldn't retrieve schema document - status code %s\n%s" % (
                     response.status_code, response.content)
             )
-        return response.json()['schema']
+        schema = response.json()['schema']
+        etag = response.headers.get('ETag')
+        if etag:
+            with _SCHEMA_CACHE_LOCK:
+                _SCHEMA_CACHE[schema_url] = (etag, schema)
+        return schema
 
     def _extract_datefields(self, schema):
         ret = [x['name'] for x in
@@ -310,6 +767,62 @@ class SolrInterface(object):
                     if x['type'] == 'date'])
         return ret
 
+    def _compile_datefields(self):
+        # Split the datefields once so that per-field lookups in
+        # _prepare_docs are an O(1) set test plus a single tuple-endswith
+        # instead of two scans over the whole list.
+        exact, suffixes, prefixes, patterns = set(), [], [], []
+        for name in self._datefields:
+            if '*' not in name:
+                exact.add(name)
+            elif name.startswith('*') and '*' not in name[1:]:
+                suffixes.append(name[1:])
+            elif name.endswith('*') and '*' not in name[:-1]:
+                prefixes.append(name[:-1])
+            else:
+                patterns.append(name)
+        self._datefield_exact = frozenset(exact)
+        self._datefield_suffix = tuple(suffixes)
+        self._datefield_prefix = tuple(prefixes)
+        self._datefield_patterns = patterns
+        # With hundreds of dynamic '*_dt'-style fields, tuple-endswith
+        # still compares every suffix.  Build an Aho-Corasick automaton
+        # over the reversed suffixes instead, if pyahocorasick is
+        # installed; below 16 suffixes the automaton isn't worth its
+        # overhead.
+        self._datefield_automaton = None
+        if len(self._datefield_suffix) > 16:
+            try:
+                import ahocorasick
+            except ImportError:
+                pass
+            else:
+                automaton = ahocorasick.Automaton()
+                for suffix in self._datefield_suffix:
+                    automaton.add_word(suffix[::-1], len(suffix))
+                automaton.make_automaton()
+                self._datefield_automaton = automaton
+
+    def _is_datetime_field(self, name):
+        if name in self._datefield_exact:
+            return True
+        if self._datefield_automaton is not None:
+            # a suffix of ``name`` is a match of a reversed suffix at the
+            # start of the reversed name
+            reversed_name = name[::-1]
+            for end_index, length in \
+                    self._datefield_automaton.iter(reversed_name):
+                if end_index == length - 1:
+                    return True
+        elif self._datefield_suffix and name.endswith(self._datefield_suffix):
+            return True
+        if self._datefield_prefix and name.startswith(self._datefield_prefix):
+            return True
+        if self._datefield_patterns:
+            return scorched.dates.is_datetime_field(
+                name, self._datefield_patterns)
+        return False
+
     def _should_skip_value(self, value):
         if value is None:
             return True
@@ -321,56 +834,110 @@ class SolrInterface(object):
             return True
         return False
 
+    def _convert_date(self, value):
+        try:
+            return _solr_date_str(value)
+        except TypeError:
+            # unhashable value; convert without the cache
+            return str(scorched.dates.solr_date(value))
+
     def _prepare_date(self, value):
         ''' Prepare a value of type date
         '''
         if is_iter(value):
-            value = [str(scorched.dates.solr_date(v)) for v in
-                     value]
+            value = [self._convert_date(v) for v in value]
         else:
-            value = str(scorched.dates.solr_date(value))
+            value = self._convert_date(value)
         return value
 
     def _prepare_docs(self, docs):
-        prepared_docs = []
-        for doc in docs:
-            new_doc = {}
-            for name, value in list(doc.items()):
-                # XXX remove all None fields this is needed for adding date
-                # fields
-                if self._should_skip_value(value):
-                    continue
-                if scorched.dates.is_datetime_field(name, self._datefields):
-                    if isinstance(value, dict) and 'set' in value:
-                        value['set'] = self._prepare_date(value['set'])
-                    else:
-                        value = self._prepare_date(value)
-                new_doc[name] = value
-            prepared_docs.append(new_doc)
-        return prepared_docs
-
-    def add(self, docs, chunk=100, **kwargs):
+        def conv(name, value):
+            if self._is_datetime_field(name):
+                if isinstance(value, dict) and 'set' in value:
+                    return dict(value, set=self._prepare_date(value['set']))
+                return self._prepare_date(value)
+            return value
+
+        # None fields (and {'set': None}) are dropped; this is needed for
+        # adding date fields
+        return [
+            {name: conv(name, value) for name, value in doc.items()
+             if not self._should_skip_value(value)}
+            for doc in docs
+        ]
+
+    def _update_message(self, doc_chunk, compress):
+        prepared = self._prepare_docs(doc_chunk)
+        if compress:
+            return gzip.compress(_dumps(prepared))
+        if _HAVE_ORJSON:
+            # orjson encodes to bytes in one C pass, which beats
+            # streaming the stdlib encoder
+            return _dumps(prepared)
+        # stream the encoded docs instead of materializing one
+        # monolithic string per chunk
+        return _iterencode_docs(prepared)
+
+    def add(self, docs, chunk=100, compress=False, executor=None,
+            max_in_flight=4, **kwargs):
         """
         :param docs: documents to be added
         :type docs: dict
         :param chunk: optional -- size of chunks in which the add command
         should be split
         :type chunk: int
+        :param compress: optional -- gzip the message body, trading CPU
+        for bytes on the wire; worthwhile for large chunks
+        :type compress: bool
+        :param executor: optional -- executor to POST the chunks on; by
+        default a private thread pool is created per call
+        :type executor: concurrent.futures.Executor
+        :param max_in_flight: optional -- number of chunks POSTed
+        concurrently; with 1 the chunks are sent strictly serially
+        :type max_in_flight: int
         :param kwargs: optinal -- additional arguments
         :type kwargs: dict
         :returns: list of SolrUpdateResponse  -- A Solr response object.
 
-        Add a document or a list of document to Solr.
+        Add a document or a list of document to Solr.  Chunks are sent
+        concurrently so network round-trips overlap; the responses are
+        returned in chunk order, and a subsequent commit() only runs
+        after all chunks are acknowledged.
         """
         if hasattr(docs, "items") or not is_iter(docs):
             docs = [docs]
         # to avoid making messages too large, we break the message every
         # chunk docs.
         ret = []
-        for doc_chunk in grouper(docs, chunk):
-            update_message = json.dumps(self._prepare_docs(doc_chunk))
-            ret.append(scorched.response.SolrUpdateResponse.from_json(
-                self.conn.update(update_message, **kwargs)))
+        if max_in_flight <= 1 and executor is None:
+            for doc_chunk in grouper(docs, chunk):
+                ret.append(scorched.response.SolrUpdateResponse.from_json(
+                    self.conn.update(
+                        self._update_message(doc_chunk, compress),
+                        compressed=compress, **kwargs)))
+            return ret
+        own_executor = executor is None
+        if own_executor:
+            executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_in_flight)
+        pending = collections.deque()
+        try:
+            for doc_chunk in grouper(docs, chunk):
+                # bound the outstanding chunks so huge feeds don't pile
+                # up unbounded memory behind a slow Solr
+                while len(pending) >= max_in_flight:
+                    ret.append(scorched.response.SolrUpdateResponse
+                               .from_json(pending.popleft().result()))
+                pending.append(executor.submit(
+                    self.conn.update,
+                    self._update_message(doc_chunk, compress),
+                    compressed=compress, **kwargs))
+            while pending:
+                ret.append(scorched.response.SolrUpdateResponse
+                           .from_json(pending.popleft().result()))
+        finally:
+            if own_executor:
+                executor.shutdown()
         return ret
 
     def delete_by_query(self, query, **kwargs):
@@ -381,7 +948,7 @@ class SolrInterface(object):
 
         Delete entries by a given query
         """
-        delete_message = json.dumps({"delete": {"query": str(query)}})
+        delete_message = _dumps({"delete": {"query": str(query)}})
         ret = scorched.response.SolrUpdateResponse.from_json(
             self.conn.update(delete_message, **kwargs))
         return ret
@@ -394,7 +961,7 @@ class SolrInterface(object):
 
         Delete entries by a given id
         """
-        delete_message = json.dumps({"delete": ids})
+        delete_message = _delete_ids_message(ids)
         ret = scorched.response.SolrUpdateResponse.from_json(
             self.conn.update(delete_message, **kwargs))
         return ret
@@ -474,13 +1041,23 @@ class SolrInterface(object):
             self.conn.get(ids, fields), self._datefields)
         return ret
 
-    def search(self, **kwargs):
+    def search(self, stream=False, **kwargs):
         """
+        :param stream: optional -- parse the response incrementally off
+                       the wire instead of buffering it in memory first;
+                       useful for very large result pages
+        :type stream: bool
         :returns: SolrResponse  -- A Solr response object.
 
         Search solr
         """
         params = scorched.search.params_from_dict(**kwargs)
+        if stream:
+            return scorched.response.SolrResponse.from_stream(
+                self.conn.select(params, stream=True),
+                self.schema['uniqueKey'],
+                self._datefields,
+            )
         ret = scorched.response.SolrResponse.from_json(
             self.conn.select(params),
             self.schema['uniqueKey'],
@@ -569,12 +1146,30 @@ class SolrInterface(object):
         return q
 
 
+def _iterencode_docs(docs):
+    """
+    Incrementally encode a list of documents as a JSON array of bytes.
+
+    Passing the generator as a request body makes requests use chunked
+    transfer-encoding, so encoding overlaps with sending and the full
+    message never has to sit in memory.
+    """
+    encoder = json.JSONEncoder()
+    yield b'['
+    first = True
+    for doc in docs:
+        if first:
+            first = False
+        else:
+            yield b','
+        for part in encoder.iterencode(doc):
+            yield part.encode('utf-8')
+    yield b']'
+
+
 def grouper(iterable, n):
     """
-    grouper('ABCDEFG', 3) --> [['ABC'], ['DEF'], ['G']]
+    grouper('ABCDEFG', 3) --> [('A', 'B', 'C'), ('D', 'E', 'F'), ('G',)]
     """
-    i = iter(iterable)
-    g = list(itertools.islice(i, 0, n))
-    while g:
-        yield g
-        g = list(itertools.islice(i, 0, n))
+    it = iter(iterable)
+    return iter(lambda: tuple(itertools.islice(it, n)), ())
@@ -3,3 +3,8 @@ from __future__ import unicode_literals
 
 class SolrError(Exception):
     pass
+
+
+class SolrCircuitOpen(SolrError):
+    """Raised when the circuit breaker is open and requests fail fast
+    without hitting the network."""
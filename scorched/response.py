@@ -1,4 +1,5 @@
 from __future__ import unicode_literals
+import io
 import json
 import scorched.dates
 
@@ -114,9 +115,32 @@ class SolrResponse(Sequence):
 
     @classmethod
     def from_json(cls, jsonmsg, unique_key, datefields=()):
-        self = cls()
+        self = cls.from_doc(json.loads(jsonmsg), unique_key, datefields)
         self.original_json = jsonmsg
-        doc = json.loads(jsonmsg)
+        return self
+
+    @classmethod
+    def from_stream(cls, response, unique_key, datefields=()):
+        """Generate an instance from a streamed requests response.
+
+        ``json.load`` still reads the decoded payload into one string,
+        but the ``response.content`` bytes copy is never materialized
+        and ``original_json`` is not retained, so the payload is held
+        once instead of two to three times.  The response is closed
+        when parsing is done.
+        """
+        try:
+            response.raw.decode_content = True
+            doc = json.load(io.TextIOWrapper(response.raw,
+                                             encoding='utf-8'))
+        finally:
+            response.close()
+        return cls.from_doc(doc, unique_key, datefields)
+
+    @classmethod
+    def from_doc(cls, doc, unique_key, datefields=()):
+        self = cls()
+        self.original_json = None
         details = doc['responseHeader']
         for attr in ["QTime", "params", "status"]:
             setattr(self, attr, details.get(attr))
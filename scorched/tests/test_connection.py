@@ -1,6 +1,7 @@
 from __future__ import unicode_literals
 
 import datetime
+import io
 import json
 import os
 import requests
@@ -25,16 +26,21 @@ def httpbin(*suffix):
 
 class TestConnection(unittest.TestCase):
 
+    def setUp(self):
+        # breakers are shared per host; isolate the tests from each other
+        scorched.connection._BREAKERS.clear()
+
     def _make_connection(self, url="http://localhost:8983/solr",
                          http_connection=None, mode="r", retry_timeout=-1,
-                         max_length_get_url=2048):
+                         max_length_get_url=2048, **kwargs):
 
         sc = scorched.connection.SolrConnection(
             url=url,
             http_connection=http_connection,
             mode=mode,
             retry_timeout=retry_timeout,
-            max_length_get_url=max_length_get_url)
+            max_length_get_url=max_length_get_url,
+            **kwargs)
 
         return sc
 
@@ -48,12 +54,13 @@ class TestConnection(unittest.TestCase):
         self.assertRaises(TypeError, sc.select, {})
 
     def test_mlt(self):
+        # the GET paths send a once-prepared request via Session.send
         sc = self._make_connection(mode="")
-        with mock.patch.object(requests.Session, 'request',
+        with mock.patch.object(requests.Session, 'send',
                                return_value=mock.Mock(status_code=500)):
             self.assertRaises(scorched.exc.SolrError, sc.mlt, [])
             # test content
-        with mock.patch.object(requests.Session, 'request',
+        with mock.patch.object(requests.Session, 'send',
                                return_value=mock.Mock(status_code=500)):
             self.assertRaises(scorched.exc.SolrError, sc.mlt, [],
                               content="fooo")
@@ -81,6 +88,128 @@ class TestConnection(unittest.TestCase):
         sc = self._make_connection(url="http://localhost:1234/none", mode="")
         self.assertRaises(Exception, sc.request, (), {})
 
+    def test_request_retries_exhausted(self):
+        sc = self._make_connection(mode="", max_retries=2, base_delay=0,
+                                   jitter=0)
+        with mock.patch.object(
+                requests.Session, 'request',
+                side_effect=requests.exceptions.ConnectionError) as request:
+            self.assertRaises(requests.exceptions.ConnectionError,
+                              sc.request, 'GET', 'http://localhost:1234/')
+        self.assertEqual(request.call_count, 3)
+
+    def test_request_post_timeout_not_retried(self):
+        # a timed-out POST may have reached the server, so it must not
+        # be replayed
+        sc = self._make_connection(mode="", max_retries=2, base_delay=0,
+                                   jitter=0)
+        with mock.patch.object(
+                requests.Session, 'request',
+                side_effect=requests.exceptions.ReadTimeout) as request:
+            self.assertRaises(requests.exceptions.ReadTimeout,
+                              sc.request, 'POST', 'http://localhost:1234/')
+        self.assertEqual(request.call_count, 1)
+
+    def test_request_does_not_retry_generator_body(self):
+        # a streamed body can't be replayed once (partially) consumed
+        sc = self._make_connection(mode="", max_retries=2, base_delay=0,
+                                   jitter=0)
+        body = (part for part in [b'[', b']'])
+        with mock.patch.object(
+                requests.Session, 'request',
+                side_effect=requests.exceptions.ConnectionError) as request:
+            self.assertRaises(requests.exceptions.ConnectionError,
+                              sc.request, 'POST', 'http://localhost:1234/',
+                              data=body)
+        self.assertEqual(request.call_count, 1)
+
+    def test_request_legacy_retry_timeout(self):
+        # without max_retries, retry_timeout >= 0 means a single retry
+        # after a fixed sleep
+        sc = self._make_connection(mode="", retry_timeout=2)
+        ok = mock.Mock(status_code=200)
+        with mock.patch.object(
+                requests.Session, 'request',
+                side_effect=[requests.exceptions.ConnectionError(),
+                             ok]) as request, \
+                mock.patch('scorched.connection.time.sleep') as sleep:
+            response = sc.request('GET', 'http://localhost:1234/')
+        self.assertIs(response, ok)
+        self.assertEqual(request.call_count, 2)
+        sleep.assert_called_once_with(2)
+
+    def test_circuit_breaker_shared_per_host(self):
+        a = self._make_connection(mode="")
+        b = self._make_connection(mode="")
+        self.assertIs(a._breaker, b._breaker)
+        other = self._make_connection(url="http://otherhost:8983/solr",
+                                      mode="")
+        self.assertIsNot(a._breaker, other._breaker)
+
+    def test_circuit_breaker_opens_and_fails_fast(self):
+        sc = self._make_connection(mode="", trip_threshold=2)
+        with mock.patch.object(
+                requests.Session, 'request',
+                side_effect=requests.exceptions.ConnectionError) as request:
+            for _ in range(2):
+                self.assertRaises(requests.exceptions.ConnectionError,
+                                  sc.request, 'GET', 'http://localhost:1234/')
+            # the breaker is open now: fail fast, no network call
+            self.assertRaises(scorched.exc.SolrCircuitOpen,
+                              sc.request, 'GET', 'http://localhost:1234/')
+        self.assertEqual(request.call_count, 2)
+
+    def test_circuit_breaker_half_open_probe_closes(self):
+        sc = self._make_connection(mode="", trip_threshold=1,
+                                   reset_timeout=0)
+        with mock.patch.object(
+                requests.Session, 'request',
+                side_effect=requests.exceptions.ConnectionError):
+            self.assertRaises(requests.exceptions.ConnectionError,
+                              sc.request, 'GET', 'http://localhost:1234/')
+        self.assertEqual(sc._breaker.state, 'open')
+        # reset_timeout elapsed: a successful probe closes the breaker
+        with mock.patch.object(requests.Session, 'request',
+                               return_value=mock.Mock(status_code=200)):
+            sc.request('GET', 'http://localhost:1234/')
+        self.assertEqual(sc._breaker.state, 'closed')
+
+    def test_circuit_breaker_records_unexpected_errors(self):
+        sc = self._make_connection(url="http://breaker-garbled:8983/solr",
+                                   mode="", trip_threshold=1,
+                                   reset_timeout=0)
+        with mock.patch.object(
+                requests.Session, 'request',
+                side_effect=requests.exceptions.ChunkedEncodingError):
+            self.assertRaises(requests.exceptions.ChunkedEncodingError,
+                              sc.request, 'GET', 'http://localhost:1234/')
+            self.assertEqual(sc._breaker.state, 'open')
+            # the failing half-open probe reopens instead of leaving the
+            # breaker stuck half-open
+            self.assertRaises(requests.exceptions.ChunkedEncodingError,
+                              sc.request, 'GET', 'http://localhost:1234/')
+        self.assertEqual(sc._breaker.state, 'open')
+        self.assertTrue(sc._breaker.allow())
+
+    def test_circuit_breaker_state_machine(self):
+        breaker = scorched.connection._CircuitBreaker(trip_threshold=2,
+                                                      reset_timeout=0)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        # reset_timeout elapsed: one half-open probe is let through,
+        # concurrent callers stay blocked
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        # a failing probe reopens immediately
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
     def test_url_for_update(self):
         dsn = "http://localhost:1234/none"
         sc = self._make_connection(url=dsn)
@@ -168,6 +297,9 @@ class TestConnection(unittest.TestCase):
 
 class TestSolrInterface(unittest.TestCase):
 
+    def setUp(self):
+        scorched.connection._BREAKERS.clear()
+
     def _make_one(self):
         import scorched.connection
         import scorched.tests.schema
@@ -208,3 +340,113 @@ class TestSolrInterface(unittest.TestCase):
             result[0]['last_modified']['set'],
             '2014-02-18T12:12:10Z',
         )
+
+    def test_init_schema_etag_cache(self):
+        import scorched.connection
+        import scorched.tests.schema
+        ok = mock.Mock(status_code=200, headers={'ETag': '"abc"'})
+        ok.json.return_value = {'schema': scorched.tests.schema.schema}
+        with mock.patch.object(requests.Session, 'request',
+                               return_value=ok):
+            si = scorched.connection.SolrInterface(
+                'http://localhost:2223/etagsolr')
+        # a 304 revalidation serves the schema from the cache
+        not_modified = mock.Mock(status_code=304, headers={})
+        with mock.patch.object(requests.Session, 'request',
+                               return_value=not_modified) as request:
+            si2 = scorched.connection.SolrInterface(
+                'http://localhost:2223/etagsolr')
+        self.assertEqual(
+            request.call_args[1]['headers']['If-None-Match'], '"abc"')
+        self.assertEqual(si2.schema, si.schema)
+
+    def test_add_chunks_and_collects_responses(self):
+        sc = self._make_one()
+        docs = [{'id': str(i)} for i in range(10)]
+
+        def fake_update(body, **kwargs):
+            return '{"responseHeader": {"status": 0}}'
+
+        with mock.patch.object(sc.conn, 'update',
+                               side_effect=fake_update) as update:
+            ret = sc.add(docs, chunk=3)
+        self.assertEqual(update.call_count, 4)
+        self.assertEqual(len(ret), 4)
+        # the serial path behaves identically
+        with mock.patch.object(sc.conn, 'update',
+                               side_effect=fake_update) as update:
+            ret = sc.add(docs, chunk=3, max_in_flight=1)
+        self.assertEqual(update.call_count, 4)
+        self.assertEqual(len(ret), 4)
+
+    def test_search_stream(self):
+        sc = self._make_one()
+
+        class FakeRaw(io.BytesIO):
+            # io.BytesIO doesn't accept new attributes; urllib3's raw
+            # stream grows a decode_content flag
+            pass
+
+        payload = {
+            "responseHeader": {"status": 0, "QTime": 1,
+                               "params": {"q": "*", "wt": "json"}},
+            "response": {"numFound": 0, "start": 0, "docs": []},
+        }
+        raw = FakeRaw(json.dumps(payload).encode('utf-8'))
+        response = mock.Mock(status_code=200, raw=raw)
+        with mock.patch.object(sc.conn, 'request',
+                               return_value=response) as request:
+            ret = sc.search(q='*', stream=True)
+        self.assertTrue(request.call_args[1]['stream'])
+        # gzipped bodies must be decoded before parsing
+        self.assertTrue(raw.decode_content)
+        response.close.assert_called_once_with()
+        self.assertEqual(ret.status, 0)
+        self.assertIsNone(ret.original_json)
+        self.assertEqual(ret.result.docs, [])
+
+    def test_search_stream_error_closes_response(self):
+        sc = self._make_one()
+        response = mock.Mock(status_code=500)
+        with mock.patch.object(requests.Session, 'send',
+                               return_value=response):
+            self.assertRaises(scorched.exc.SolrError,
+                              sc.search, q='*', stream=True)
+        # the pooled connection must be released even though nothing
+        # consumed the streamed body
+        response.close.assert_called_once_with()
+
+    def test_delete_by_ids_messages(self):
+        sc = self._make_one()
+        captured = []
+
+        def fake_update(body, **kwargs):
+            captured.append(body)
+            return '{"responseHeader": {"status": 0}}'
+
+        with mock.patch.object(sc.conn, 'update', side_effect=fake_update):
+            sc.delete_by_ids(['a', 'b'])
+            sc.delete_by_ids([1, 2, 3])
+            # ids needing escaping take the generic encoder
+            sc.delete_by_ids(['quo"te', 'back\\slash'])
+        self.assertEqual(json.loads(captured[0]), {"delete": ["a", "b"]})
+        self.assertEqual(json.loads(captured[1]), {"delete": [1, 2, 3]})
+        self.assertEqual(
+            json.loads(captured[2]),
+            {"delete": ['quo"te', 'back\\slash']})
+
+    def test__is_datetime_field(self):
+        sc = self._make_one()
+        # exact field from the schema
+        self.assertTrue(sc._is_datetime_field('last_modified'))
+        # dynamic field matching the '*_dt' pattern
+        self.assertTrue(sc._is_datetime_field('created_dt'))
+        self.assertFalse(sc._is_datetime_field('name'))
+        self.assertFalse(sc._is_datetime_field('count_i'))
+
+    def test__prepare_docs_converts_dynamic_datefield(self):
+        sc = self._make_one()
+        dt = datetime.datetime(2014, 2, 18, 12, 12, 10)
+        docs = [{'created_dt': dt}]
+        result = sc._prepare_docs(docs)
+        self.assertEqual(result[0]['created_dt'], "2014-02-18T12:12:10Z")
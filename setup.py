@@ -48,6 +48,9 @@ setup(name='scorched',
       ],
       extras_require={
           'test': ["nose", "coverage", "mock"],
+          'http2': ["httpx[http2]"],
+          'orjson': ["orjson"],
+          'ahocorasick': ["pyahocorasick"],
       },
       test_suite='scorched.tests',
       setup_requires=["setuptools_git"],